@@ -1,17 +1,40 @@
 import os
 import sys
+import json
 import time
 import signal
 import subprocess
+import threading
 import requests
-from flask import Flask, jsonify, request, render_template_string
+from requests.adapters import HTTPAdapter
+from flask import Flask, Response, jsonify, request, render_template_string
 
 app = Flask(__name__)
 
 PROCS = {"emotion": None, "bot": None}
 
+EMOTION_API_URL = "http://127.0.0.1:5000/emotion"
+HEALTH_CHECK_INTERVAL = 2.0
+EMOTION_API_HEALTHY = False  # updated by the health checker thread
+
+# bumped whenever status_payload() may have changed; /events waits on it
+status_changed = threading.Condition()
+status_version = 0
+
+# reuse keep-alive connections to the emotion API instead of reconnecting per call
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=1))
+SESSION.headers["Connection"] = "keep-alive"
+
 
 # ---------------- Utilities ----------------
+def notify_status_changed():
+    global status_version
+    with status_changed:
+        status_version += 1
+        status_changed.notify_all()
+
+
 def pyexe():
     return sys.executable  # uses current venv python
 
@@ -40,6 +63,7 @@ def start_process(name: str, script: str):
         creationflags=creationflags,
     )
     PROCS[name] = p
+    notify_status_changed()
     return {"ok": True, "message": f"Started {name}", "pid": p.pid}
 
 
@@ -56,31 +80,66 @@ def stop_process(name: str):
         if os.name == "nt":
             # best effort graceful
             p.send_signal(signal.CTRL_BREAK_EVENT)
-            time.sleep(0.8)
         else:
             p.terminate()
-            time.sleep(0.8)
+
+        # returns as soon as the child exits, kill only if it doesn't in time
+        try:
+            p.wait(timeout=0.8)
+        except subprocess.TimeoutExpired:
+            pass
 
         if p.poll() is None:
             p.kill()
 
         PROCS[name] = None
+        notify_status_changed()
         return {"ok": True, "message": f"Stopped {name}"}
     except Exception as e:
         return {"ok": False, "message": f"Stop failed: {e}"}
 
 
+def check_emotion_api(timeout=0.4):
+    global EMOTION_API_HEALTHY
+    try:
+        r = SESSION.get(EMOTION_API_URL, timeout=(0.2, timeout))
+        healthy = r.status_code == 200
+    except Exception:
+        healthy = False
+
+    if healthy != EMOTION_API_HEALTHY:
+        EMOTION_API_HEALTHY = healthy
+        notify_status_changed()
+    return healthy
+
+
+def health_check_loop():
+    # keeps blocking I/O off the /status request path; also catches child
+    # processes exiting on their own
+    last = None
+    while True:
+        check_emotion_api()
+        current = status_payload()
+        if current != last:
+            notify_status_changed()
+            last = current
+        time.sleep(HEALTH_CHECK_INTERVAL)
+
+
 def wait_for_emotion_api(timeout=8.0):
     start = time.time()
-    while time.time() - start < timeout:
-        try:
-            r = requests.get("http://127.0.0.1:5000/emotion", timeout=0.4)
-            if r.status_code == 200:
-                return True
-        except Exception:
-            pass
-        time.sleep(0.2)
-    return False
+    delay = 0.05
+    while True:
+        if check_emotion_api():
+            return True
+
+        remaining = timeout - (time.time() - start)
+        if remaining <= 0:
+            return False
+
+        # exponential backoff: 0.05, 0.1, 0.2, 0.4, 0.8, 1.0, 1.0, ...
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 1.0)
 
 
 def status_payload():
@@ -89,7 +148,7 @@ def status_payload():
         "bot_running": is_running("bot"),
         "emotion_pid": (PROCS["emotion"].pid if is_running("emotion") else None),
         "bot_pid": (PROCS["bot"].pid if is_running("bot") else None),
-        "emotion_api_reachable": wait_for_emotion_api(timeout=0.1),
+        "emotion_api_reachable": EMOTION_API_HEALTHY,
     }
 
 
@@ -277,7 +336,10 @@ async function stopSystem(){
 
 async function refreshStatus(){
   const r = await fetch('/status');
-  const j = await r.json();
+  renderStatus(await r.json());
+}
+
+function renderStatus(j){
   document.getElementById('statusBox').textContent = JSON.stringify(j, null, 2);
 
   const hint = document.getElementById('hint');
@@ -293,9 +355,8 @@ async function refreshStatus(){
   }
 }
 
-// auto-refresh every 1.5s so you don't need a refresh button
-setInterval(refreshStatus, 1500);
-refreshStatus();
+// server pushes status on change so you don't need a refresh button
+new EventSource('/events').onmessage = e => renderStatus(JSON.parse(e.data));
 </script>
 </body>
 </html>
@@ -313,6 +374,26 @@ def status():
     return jsonify(status_payload())
 
 
+@app.get("/events")
+def events():
+    # Server-Sent Events: send the status now, then again only when it changes
+    def stream():
+        seen = None
+        while True:
+            with status_changed:
+                status_changed.wait_for(lambda: status_version != seen, timeout=15.0)
+                changed = status_version != seen
+                seen = status_version
+
+            if changed:
+                yield f"data: {json.dumps(status_payload())}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
+
+
 @app.post("/start")
 def start():
     # Start webcam first
@@ -340,8 +421,10 @@ def stop():
     # Stop bot first, then webcam
     res_bot = stop_process("bot")
     res_emotion = stop_process("emotion")
+    check_emotion_api()  # don't wait for the next health check to report it down
     return jsonify({"bot": res_bot, "emotion": res_emotion})
 
 
 if __name__ == "__main__":
+    threading.Thread(target=health_check_loop, daemon=True).start()
     app.run(host="127.0.0.1", port=8000, debug=False)
@@ -0,0 +1,151 @@
+import os
+import cv2
+import numpy as np
+import torch
+from torchvision import models
+from typing import Optional, Tuple
+
+# =========================
+# Shared model + face helpers (no work at import time)
+# used by emotion_webcam.py and quantize_model.py
+# =========================
+
+CHECKPOINT_PATH = "emotion_cnn_resnet50_best.pth"
+SAFETENSORS_PATH = "emotion_cnn_resnet50_best.safetensors"  # optional, preferred if present
+QUANTIZED_MODEL_PATH = "resnet50_int8.pt"  # produced by quantize_model.py
+# stored inside the INT8 file so models built for a different input order are rejected
+QUANTIZED_INPUT_ORDER = "BGR"
+INPUT_SIZE = (224, 224)
+
+CLASSES = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+
+# ImageNet normalisation in BGR order (conv1 is permuted to take BGR, see below)
+MEAN_BGR = [0.406, 0.456, 0.485]
+STD_BGR = [0.225, 0.224, 0.229]
+
+# https://github.com/opencv/opencv_zoo/tree/main/models/face_detection_yunet
+YUNET_MODEL_PATH = "face_detection_yunet_2023mar.onnx"
+MIN_FACE_SIZE = 100
+
+# detect on a half-size frame and scale the box back up for cropping
+DETECT_SCALE = 0.5
+
+Box = Tuple[int, int, int, int]
+
+
+# ---------------- Model ----------------
+def load_resnet50(map_location="cpu") -> torch.nn.Module:
+    model = models.resnet50()
+    num_features = model.fc.in_features
+    model.fc = torch.nn.Linear(num_features, len(CLASSES))
+
+    # mmap'd weights assigned straight into the model: no second full copy
+    if os.path.exists(SAFETENSORS_PATH):
+        from safetensors.torch import load_file
+        checkpoint = load_file(SAFETENSORS_PATH, device=str(map_location))
+    else:
+        checkpoint = torch.load(CHECKPOINT_PATH, map_location=map_location,
+                                mmap=True, weights_only=True)
+    model.load_state_dict(checkpoint, assign=True)
+
+    # trained on RGB; permute conv1's input channels once so the model takes
+    # OpenCV's BGR frames directly instead of converting every face crop
+    # (new tensor rather than an in-place write into the mapped file)
+    model.conv1.weight = torch.nn.Parameter(model.conv1.weight[:, [2, 1, 0]])
+    return model
+
+
+def checkpoint_path() -> str:
+    # whichever weights file load_resnet50 reads
+    return SAFETENSORS_PATH if os.path.exists(SAFETENSORS_PATH) else CHECKPOINT_PATH
+
+
+def normalization(device) -> Tuple[torch.Tensor, torch.Tensor]:
+    # kept on the device so preprocessing stays in torch
+    mean = torch.tensor(MEAN_BGR, device=device).view(1, 3, 1, 1)
+    std = torch.tensor(STD_BGR, device=device).view(1, 3, 1, 1)
+    return mean, std
+
+
+def face_to_tensor(face_bgr: np.ndarray, mean: torch.Tensor, std: torch.Tensor) -> torch.Tensor:
+    # resize in OpenCV, then convert + normalise as tensor ops (no PIL round-trip);
+    # stays BGR since conv1 was permuted to match
+    face = cv2.resize(face_bgr, INPUT_SIZE, interpolation=cv2.INTER_LINEAR)
+
+    t = torch.from_numpy(face).to(mean.device).permute(2, 0, 1).unsqueeze(0).float()
+    return t.div_(255.0).sub_(mean).div_(std)
+
+
+# ---------------- Face detection (YuNet, Haar cascade fallback) ----------------
+class FaceDetector:
+    def __init__(self):
+        self.yunet = None
+        self.cascade = None
+
+        if hasattr(cv2, "FaceDetectorYN") and os.path.exists(YUNET_MODEL_PATH):
+            self.yunet = cv2.FaceDetectorYN.create(
+                YUNET_MODEL_PATH, "", (640, 480), 0.6, 0.3, 5000
+            )
+            self.name = "YuNet"
+        else:
+            self.cascade = cv2.CascadeClassifier(
+                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+            )
+            self.name = "Haar cascade"
+
+    def find_box(self, frame_bgr: np.ndarray) -> Optional[Box]:
+        small = cv2.resize(frame_bgr, (0, 0), fx=DETECT_SCALE, fy=DETECT_SCALE,
+                           interpolation=cv2.INTER_AREA)
+        min_size = int(MIN_FACE_SIZE * DETECT_SCALE)
+
+        if self.yunet is not None:
+            self.yunet.setInputSize((small.shape[1], small.shape[0]))
+            _, detections = self.yunet.detect(small)
+            if detections is None:
+                return None
+            faces = [d[:4] for d in detections if d[2] >= min_size and d[3] >= min_size]
+        else:
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            faces = self.cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(min_size, min_size)
+            )
+
+        if len(faces) == 0:
+            return None
+
+        x, y, w, h = max(faces, key=lambda r: r[2] * r[3])
+        box = tuple(int(v / DETECT_SCALE) for v in (x, y, w, h))
+
+        # YuNet can return boxes hanging off the frame edge
+        return clamp_box(box, frame_bgr.shape)
+
+    def detect(self, frame_bgr: np.ndarray) -> Optional[np.ndarray]:
+        box = self.find_box(frame_bgr)
+        if box is None:
+            return None
+        return crop_face(frame_bgr, box)
+
+
+def clamp_box(box: Box, frame_shape: Tuple[int, ...]) -> Optional[Box]:
+    # trackers don't keep the box inside the frame; None once nothing is left
+    x, y, w, h = box
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(frame_shape[1], x + w), min(frame_shape[0], y + h)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def crop_face(frame_bgr: np.ndarray, box: Box) -> np.ndarray:
+    x, y, w, h = box
+    padding = int(0.2 * w)
+
+    x = max(0, x - padding)
+    y = max(0, y - padding)
+    w = min(frame_bgr.shape[1] - x, w + 2 * padding)
+    h = min(frame_bgr.shape[0] - y, h + 2 * padding)
+
+    return frame_bgr[y:y + h, x:x + w]
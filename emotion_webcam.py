@@ -1,13 +1,45 @@
+import os
+
+# OpenCV, PyTorch and Flask share this process: size the OpenMP/MKL pools
+# before torch is imported so they don't each grab every core
+TORCH_THREADS = max(1, (os.cpu_count() or 2) // 2)
+os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(TORCH_THREADS))
+
 import cv2
 import numpy as np
 import torch
 import torch.nn.functional as F
-from torchvision import transforms, models
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 import time
 import threading
-from flask import Flask, jsonify
-from collections import deque
+import contextlib
+from flask import Flask, Response
+
+from emotion_model import (
+    CLASSES,
+    INPUT_SIZE,
+    QUANTIZED_INPUT_ORDER,
+    QUANTIZED_MODEL_PATH,
+    FaceDetector,
+    clamp_box,
+    crop_face,
+    face_to_tensor,
+    checkpoint_path,
+    load_resnet50,
+    normalization,
+)
+
+try:
+    import orjson
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    import json
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
 
 # =========================
 # 1) Load your trained ResNet50 model
@@ -15,74 +47,103 @@ from collections import deque
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-model = models.resnet50()
-num_features = model.fc.in_features
-model.fc = torch.nn.Linear(num_features, 7)
+torch.set_num_threads(TORCH_THREADS)
+torch.set_num_interop_threads(1)
+# preprocessing runs on the GPU when there is one, so OpenCV needs fewer threads
+cv2.setNumThreads(1 if device.type == "cuda" else 2)
+
+def load_quantized_model() -> Optional[torch.jit.ScriptModule]:
+    # INT8 is only used on CPU; on GPU the FP16 model is faster
+    if device.type != "cpu" or not os.path.exists(QUANTIZED_MODEL_PATH):
+        return None
+
+    weights = checkpoint_path()
+    if os.path.getmtime(QUANTIZED_MODEL_PATH) < os.path.getmtime(weights):
+        print(f"[emotion_server] Ignoring {QUANTIZED_MODEL_PATH}: older than {weights}, "
+              "re-run quantize_model.py")
+        return None
+
+    extra_files = {"input_order": ""}
+    qmodel = torch.jit.load(QUANTIZED_MODEL_PATH, map_location=device, _extra_files=extra_files)
+    input_order = extra_files["input_order"]
+    if isinstance(input_order, bytes):
+        input_order = input_order.decode()
+    if input_order != QUANTIZED_INPUT_ORDER:
+        print(f"[emotion_server] Ignoring {QUANTIZED_MODEL_PATH}: built for "
+              f"{input_order or 'RGB'} input, re-run quantize_model.py")
+        return None
+
+    return qmodel
 
-checkpoint = torch.load("emotion_cnn_resnet50_best.pth", map_location=device)
-model.load_state_dict(checkpoint)
-model = model.to(device)
+model = load_quantized_model()
+quantized = model is not None
+
+if quantized:
+    built = time.strftime("%Y-%m-%d %H:%M", time.localtime(os.path.getmtime(QUANTIZED_MODEL_PATH)))
+    print(f"[emotion_server] Using {QUANTIZED_MODEL_PATH} (built {built})")
+else:
+    model = load_resnet50(map_location=device).to(device, memory_format=torch.channels_last)
+    if device.type == "cuda":
+        # FP16 on GPU; input shape is fixed so let cuDNN pick the fastest kernels
+        model = model.half()
+        torch.backends.cudnn.benchmark = True
 model.eval()
 
-CLASSES = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+# BF16 only pays off with native AVX512-BF16/AMX; on other CPUs oneDNN
+# emulates it and the convs end up slower than FP32
+use_bf16 = (device.type == "cpu" and not quantized
+            and torch.ops.mkldnn._is_mkldnn_bf16_supported())
+
+if not quantized:
+    # input shape never changes, so trace + freeze once to drop eager dispatch
+    # overhead and fold conv+bn
+    example = torch.zeros(
+        1, 3, *INPUT_SIZE, device=device,
+        dtype=torch.half if device.type == "cuda" else torch.float,
+    ).contiguous(memory_format=torch.channels_last)
 
-transform = transforms.Compose([
-    transforms.ToPILImage(),
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                         std=[0.229, 0.224, 0.225])
-])
+    # model is already FP16 on GPU; on CPU the BF16 casts are recorded into the
+    # trace (AMP + TorchScript recipe), so the frozen model is called without
+    # autocast and the JIT autocast pass must not cast again
+    trace_autocast = contextlib.nullcontext()
+    if use_bf16:
+        torch._C._jit_set_autocast_mode(False)
+        trace_autocast = torch.autocast("cpu", dtype=torch.bfloat16, cache_enabled=False)
 
-print(f"[emotion_server] Model loaded on {device}")
+    with torch.no_grad(), trace_autocast:
+        model = torch.jit.freeze(torch.jit.trace(model, example))
+
+CLASS_INDEX = {c: i for i, c in enumerate(CLASSES)}
+
+mean, std = normalization(device)
+
+print(f"[emotion_server] Model loaded on {device}{' (INT8)' if quantized else ''}")
 print(f"[emotion_server] Emotion classes: {CLASSES}")
 
 # =========================
-# 2) Face detection (Haar cascade)
+# 2) Face detection (YuNet, Haar cascade fallback)
 # =========================
 
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-)
+face_detector = FaceDetector()
+print(f"[emotion_server] Face detector: {face_detector.name}")
 
 # =========================
 # 3) Emotion prediction
 # =========================
 
-def detect_face(frame_bgr: np.ndarray) -> Optional[np.ndarray]:
-    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(100, 100)
-    )
-
-    if len(faces) == 0:
-        return None
-
-    x, y, w, h = max(faces, key=lambda r: r[2] * r[3])
-    padding = int(0.2 * w)
-
-    x = max(0, x - padding)
-    y = max(0, y - padding)
-    w = min(frame_bgr.shape[1] - x, w + 2 * padding)
-    h = min(frame_bgr.shape[0] - y, h + 2 * padding)
-
-    return frame_bgr[y:y + h, x:x + w]
+def preprocess_face(face_bgr: np.ndarray) -> torch.Tensor:
+    t = face_to_tensor(face_bgr, mean, std)
 
-def predict_emotion_from_frame(frame_bgr: np.ndarray) -> Dict[str, Any]:
-    face = detect_face(frame_bgr)
+    if device.type == "cuda":
+        t = t.half()
+    return t.contiguous(memory_format=torch.channels_last)
 
-    if face is None:
-        return {"emotion": "neutral", "confidence": 0.0}
+def predict_emotion_from_face(face: np.ndarray) -> Dict[str, Any]:
+    input_tensor = preprocess_face(face)
 
-    frame_rgb = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
-    input_tensor = transform(frame_rgb).unsqueeze(0).to(device)
-
-    with torch.no_grad():
+    with torch.inference_mode():
         logits = model(input_tensor)
-        probs = F.softmax(logits, dim=1)[0].cpu().numpy()
+        probs = F.softmax(logits.float(), dim=1)[0].cpu().numpy()
 
     pred_idx = int(np.argmax(probs))
     conf = float(np.max(probs))
@@ -94,7 +155,52 @@ def predict_emotion_from_frame(frame_bgr: np.ndarray) -> Dict[str, Any]:
 # 4) Rolling 5-second window
 # =========================
 
-emotion_window = deque(maxlen=5)
+# fixed-size ring buffer, one array per field (emotion stored as CLASSES index)
+WINDOW_SIZE = 5
+_ts = np.zeros(WINDOW_SIZE)
+_emo = np.full(WINDOW_SIZE, -1, dtype=np.int8)
+_conf = np.zeros(WINDOW_SIZE, dtype=np.float32)
+_head = 0
+_count = 0
+window_lock = threading.Lock()
+
+def window_append(timestamp: float, emotion: str, confidence: float):
+    global _head, _count
+    with window_lock:
+        _ts[_head] = timestamp
+        _emo[_head] = CLASS_INDEX[emotion]
+        _conf[_head] = confidence
+        _head = (_head + 1) % WINDOW_SIZE
+        _count = min(_count + 1, WINDOW_SIZE)
+    refresh_window_json()
+
+def window_snapshot() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # copies of the filled slots, oldest first
+    with window_lock:
+        order = np.arange(_head - _count, _head) % WINDOW_SIZE
+        return _ts[order], _emo[order], _conf[order]
+
+def window_records() -> list:
+    ts, emo, conf = window_snapshot()
+    return [
+        {"timestamp": float(t), "emotion": CLASSES[e], "confidence": float(c)}
+        for t, e, c in zip(ts, emo, conf)
+    ]
+
+# serialized once per 1 Hz sample instead of on every GET
+window_json = b"[]"
+emotion_window_json = b""
+
+def refresh_window_json():
+    global window_json, emotion_window_json
+    records = window_records()
+    window_json = dumps(records)
+    emotion_window_json = dumps({
+        "window_size": len(records),
+        "data": records
+    })
+
+refresh_window_json()
 
 # =========================
 # 5) Webcam loop + LIVE PREVIEW
@@ -108,6 +214,51 @@ latest: Dict[str, Any] = {
 
 stop_event = threading.Event()
 
+# full detection only every N frames; the box is tracked in between
+DETECT_EVERY_N_FRAMES = 5
+
+# the API only samples at 1 Hz; 5 Hz keeps the overlay responsive
+PREDICT_INTERVAL = 0.2
+
+def create_tracker():
+    # MOSSE needs opencv-contrib; without it the last detected box is reused
+    legacy = getattr(cv2, "legacy", None)
+    if legacy is None or not hasattr(legacy, "TrackerMOSSE_create"):
+        return None
+    return legacy.TrackerMOSSE_create()
+
+# the three text lines fit in the top rows of the frame
+OVERLAY_BAND_HEIGHT = 110
+
+def render_overlay(width: int, emotion: str, confidence: float,
+                   last5: list) -> Tuple[np.ndarray, np.ndarray]:
+    # text band + mask, redrawn only when the displayed values change
+    overlay = np.zeros((OVERLAY_BAND_HEIGHT, width, 3), dtype=np.uint8)
+    cv2.putText(overlay, f"Emotion: {emotion}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    cv2.putText(overlay, f"Conf: {confidence:.2f}", (10, 65),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    cv2.putText(overlay, f"Last 5s: {last5}", (10, 100),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    mask = cv2.cvtColor(overlay, cv2.COLOR_BGR2GRAY)
+    return overlay, mask
+
+def capture_loop(cap, slot: list, frame_ready: threading.Condition):
+    # keep draining the driver buffer so the consumer always gets the newest frame
+    while not stop_event.is_set():
+        if not cap.grab():
+            time.sleep(0.05)
+            continue
+
+        ok, frame = cap.retrieve()
+        if not ok:
+            continue
+
+        with frame_ready:
+            slot[0] = frame
+            frame_ready.notify()
+
 def webcam_loop(cam_index: int = 0):
     cap = cv2.VideoCapture(cam_index, cv2.CAP_DSHOW)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
@@ -120,40 +271,75 @@ def webcam_loop(cam_index: int = 0):
 
     print("[emotion_server] Webcam started. Press ESC to stop.")
     last_sample_time = time.time()
+    last_predict_time = 0.0
+    frame_counter = 0
+    last_box = None
+    tracker = None
+
+    last5 = []
+    overlay_key = None
+    overlay_img = overlay_mask = None
+
+    latest_frame = [None]
+    frame_ready = threading.Condition()
+    capture_thread = threading.Thread(
+        target=capture_loop, args=(cap, latest_frame, frame_ready), daemon=True
+    )
+    capture_thread.start()
 
     try:
         while not stop_event.is_set():
-            ok, frame = cap.read()
-            if not ok:
-                time.sleep(0.05)
-                continue
+            with frame_ready:
+                if not frame_ready.wait_for(lambda: latest_frame[0] is not None, timeout=1.0):
+                    continue
+                frame = latest_frame[0]
+                latest_frame[0] = None
+
+            # ---- detect every N frames, track in between ----
+            if frame_counter % DETECT_EVERY_N_FRAMES == 0:
+                last_box = face_detector.find_box(frame)
+                tracker = None
+                if last_box is not None:
+                    tracker = create_tracker()
+                    if tracker is not None:
+                        tracker.init(frame, last_box)
+            elif tracker is not None:
+                tracked, box = tracker.update(frame)
+                last_box = clamp_box(tuple(int(v) for v in box), frame.shape) if tracked else None
 
-            out = predict_emotion_from_frame(frame)
             now = time.time()
 
-            # update latest
-            latest["emotion"] = out["emotion"]
-            latest["confidence"] = out["confidence"]
-            latest["timestamp"] = now
+            # ---- update latest ----
+            if now - last_predict_time >= PREDICT_INTERVAL:
+                face = crop_face(frame, last_box) if last_box is not None else None
+                if face is None or face.size == 0:
+                    last_box = None
+                    out = {"emotion": "neutral", "confidence": 0.0}
+                else:
+                    out = predict_emotion_from_face(face)
+
+                latest["emotion"] = out["emotion"]
+                latest["confidence"] = out["confidence"]
+                latest["timestamp"] = now
+                last_predict_time = now
+
+            frame_counter += 1
 
             # ---- sample once per second ----
             if now - last_sample_time >= 1.0:
-                emotion_window.append({
-                    "timestamp": now,
-                    "emotion": out["emotion"],
-                    "confidence": out["confidence"]
-                })
+                window_append(now, latest["emotion"], latest["confidence"])
+                last5 = [CLASSES[e] for e in window_snapshot()[1]]
                 last_sample_time = now
 
             # ---- overlay ----
-            cv2.putText(frame, f"Emotion: {latest['emotion']}", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            cv2.putText(frame, f"Conf: {latest['confidence']:.2f}", (10, 65),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-            last5 = [e["emotion"] for e in emotion_window]
-            cv2.putText(frame, f"Last 5s: {last5}", (10, 100),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            key = (frame.shape[1], latest["emotion"], round(latest["confidence"], 2), tuple(last5))
+            if key != overlay_key:
+                overlay_img, overlay_mask = render_overlay(
+                    frame.shape[1], latest["emotion"], latest["confidence"], last5
+                )
+                overlay_key = key
+            band = frame[:OVERLAY_BAND_HEIGHT]
+            cv2.copyTo(overlay_img, overlay_mask, band)
 
             cv2.imshow("Emotion Webcam", frame)
 
@@ -161,9 +347,9 @@ def webcam_loop(cam_index: int = 0):
                 stop_event.set()
                 break
 
-            time.sleep(0.01)
-
     finally:
+        stop_event.set()
+        capture_thread.join(timeout=1.0)
         cap.release()
         cv2.destroyAllWindows()
         print("[emotion_server] Webcam stopped.")
@@ -174,20 +360,26 @@ def webcam_loop(cam_index: int = 0):
 
 app = Flask(__name__)
 
+def json_response(payload: bytes) -> Response:
+    return Response(payload, mimetype="application/json")
+
 @app.get("/emotion_json")
 def get_emotion_json():
-    return jsonify(latest)
+    return json_response(dumps(latest))
 
 @app.get("/emotion")
 def get_emotion_window():
-    return jsonify({
-        "window_size": len(emotion_window),
-        "data": list(emotion_window)
-    })
+    return json_response(emotion_window_json)
+
+@app.get("/emotion_bin")
+def get_emotion_window_bin():
+    # int8 CLASSES indices followed by float32 confidences, oldest first
+    _, emo, conf = window_snapshot()
+    return Response(emo.tobytes() + conf.tobytes(), mimetype="application/octet-stream")
 
 @app.get("/window")
 def get_window():
-    return jsonify(list(emotion_window))
+    return json_response(window_json)
 
 # =========================
 # 7) Main
@@ -1,6 +1,9 @@
 import time
 import os
+import re
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 from furhat_remote_api import FurhatRemoteAPI
 from dotenv import load_dotenv
 from google import genai
@@ -10,12 +13,26 @@ from google.genai import types
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# ---------------- Emotion API Session ----------------
+# keep-alive pool so each emotion read skips the TCP connect
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=1))
+SESSION.headers["Connection"] = "keep-alive"
+
+# must match CLASSES in emotion_webcam.py (indices used by /emotion_bin)
+EMOTION_CLASSES = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+NEUTRAL_INDEX = EMOTION_CLASSES.index("neutral")
+
+# window is sampled at 1 Hz, so re-reading it faster than this is wasted
+EMOTION_CACHE_TTL = 0.5
+
 # ---------------- Elder Companion Bot ----------------
 class ElderCompanionBot:
     def __init__(self, furhat_ip="localhost"):
         self.furhat = FurhatRemoteAPI(furhat_ip)
         self.user_name = "Friend"
         self.last_emotion = "neutral"
+        self._emo_cache = (0.0, None)  # (fetch time, raw /emotion_bin payload)
 
         # -------- Emotion → Gesture Mapping --------
         self.emotion_gestures = {
@@ -85,45 +102,54 @@ class ElderCompanionBot:
         3) All neutral -> ask LLM to infer emotion from user_input
         """
         try:
-            response = requests.get("http://127.0.0.1:5000/emotion", timeout=1.0)
-            if response.status_code != 200:
+            content = self.fetch_emotion_window()
+            if content is None:
                 return "neutral"
 
-            payload = response.json()
-            frames = payload.get("data", [])
-
-            if not frames:
+            # --- int8 emotion indices followed by float32 confidences ---
+            n = len(content) // 5
+            if n == 0:
                 return "neutral"
 
-            # --- Group confidences by emotion ---
-            counts = {}
-            for f in frames:
-                emo = f["emotion"].lower()
-                conf = float(f["confidence"])
-                counts.setdefault(emo, []).append(conf)
+            emos = np.frombuffer(content, dtype=np.int8, count=n)
+            confs = np.frombuffer(content, dtype=np.float32, count=n, offset=n)
+
+            emotion = self.decide_emotion(emos, confs)
 
             # --- Case 3: all neutral → LLM fallback ---
-            if list(counts.keys()) == ["neutral"]:
+            if emotion is None:
                 return self.llm_emotion_fallback(user_input)
 
-            # --- Remove neutral for decision ---
-            non_neutral = {k: v for k, v in counts.items() if k != "neutral"}
-
-            # --- Case 1: exactly one non-neutral emotion ---
-            if len(non_neutral) == 1:
-                return next(iter(non_neutral.keys()))
-
-            # --- Case 2: multiple non-neutral → highest confidence wins ---
-            best_emotion = max(
-                non_neutral.items(),
-                key=lambda item: max(item[1])
-            )[0]
-
-            return best_emotion
+            return emotion
 
         except Exception as e:
             print("Webcam emotion read failed:", e)
             return "neutral"
+
+    def decide_emotion(self, emos, confs):
+        """
+        Vectorized rules 1 & 2 over the window arrays (CLASSES indices, confidences).
+        Returns None when every frame is neutral.
+        """
+        non_neutral = emos != NEUTRAL_INDEX
+        if not non_neutral.any():
+            return None
+
+        # --- highest-confidence non-neutral frame wins ---
+        best = np.argmax(np.where(non_neutral, confs, -1.0))
+        return EMOTION_CLASSES[emos[best]]
+
+    def fetch_emotion_window(self):
+        fetched_at, content = self._emo_cache
+        if content is not None and time.time() - fetched_at < EMOTION_CACHE_TTL:
+            return content
+
+        response = SESSION.get("http://127.0.0.1:5000/emotion_bin", timeout=(0.2, 1.0))
+        if response.status_code != 200:
+            return None
+
+        self._emo_cache = (time.time(), response.content)
+        return response.content
         
     def llm_emotion_fallback(self, user_input):
         prompt = (
@@ -188,11 +214,15 @@ class ElderCompanionBot:
         "stop", "2", "second"
     ]
 
+    # one compiled scan per utterance; whole words only, so "know" is not a "no"
+    YES_RE = re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, YES_WORDS)), re.IGNORECASE)
+    NO_RE = re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, NO_WORDS)), re.IGNORECASE)
+
     def is_yes(self, text):
-        return any(w in text.lower() for w in self.YES_WORDS)
+        return self.YES_RE.search(text) is not None
 
     def is_no(self, text):
-        return any(w in text.lower() for w in self.NO_WORDS)
+        return self.NO_RE.search(text) is not None
 
     def ask_yes_no(self, question, reprompt="Sorry, is that a yes or a no?"):
         self.say(question)
@@ -0,0 +1,111 @@
+import os
+import sys
+import cv2
+import torch
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+from emotion_model import (
+    INPUT_SIZE,
+    QUANTIZED_INPUT_ORDER,
+    QUANTIZED_MODEL_PATH,
+    FaceDetector,
+    face_to_tensor,
+    load_resnet50,
+    normalization,
+)
+
+# =========================
+# One-time INT8 conversion of the ResNet50 checkpoint (CPU only)
+#
+#   python quantize_model.py              -> calibrate on webcam face crops
+#   python quantize_model.py <image_dir>  -> calibrate on a folder of images
+# =========================
+
+NUM_CALIBRATION_FACES = 100
+MAX_FAILED_READS = 30
+MAX_WEBCAM_FRAMES = 900  # ~30 s at 30 fps
+PROGRESS_EVERY_N_FRAMES = 90
+
+
+def faces_from_dir(image_dir: str, detector: FaceDetector):
+    for name in sorted(os.listdir(image_dir)):
+        img = cv2.imread(os.path.join(image_dir, name))
+        if img is None:
+            continue
+        # images may already be face crops; fall back to the whole image
+        face = detector.detect(img)
+        yield img if face is None else face
+
+
+def faces_from_webcam(detector: FaceDetector, cam_index: int = 0):
+    cap = cv2.VideoCapture(cam_index, cv2.CAP_DSHOW)
+    if not cap.isOpened():
+        print("[quantize] ERROR: Cannot open webcam.")
+        return
+
+    print("[quantize] Look at the camera, collecting face crops...")
+    failed_reads = 0
+    frames = 0
+    faces = 0
+    try:
+        while frames < MAX_WEBCAM_FRAMES:
+            ok, frame = cap.read()
+            if not ok:
+                # camera opened but stopped delivering frames
+                failed_reads += 1
+                if failed_reads >= MAX_FAILED_READS:
+                    print("[quantize] ERROR: Webcam returned no frames.")
+                    return
+                continue
+
+            failed_reads = 0
+            frames += 1
+            face = detector.detect(frame)
+            if face is not None:
+                faces += 1
+                yield face
+
+            if frames % PROGRESS_EVERY_N_FRAMES == 0:
+                print(f"[quantize] {frames}/{MAX_WEBCAM_FRAMES} frames, {faces} faces so far")
+
+        print(f"[quantize] Frame budget reached with {faces} faces.")
+    finally:
+        cap.release()
+
+
+def main():
+    detector = FaceDetector()
+    if len(sys.argv) > 1:
+        source = faces_from_dir(sys.argv[1], detector)
+    else:
+        source = faces_from_webcam(detector)
+
+    model = load_resnet50(map_location="cpu").eval()
+    mean, std = normalization("cpu")
+    example = torch.zeros(1, 3, *INPUT_SIZE)
+
+    qconfig_mapping = get_default_qconfig_mapping("x86")
+    prepared = prepare_fx(model, qconfig_mapping, example_inputs=(example,))
+
+    seen = 0
+    with torch.no_grad():
+        for face in source:
+            prepared(face_to_tensor(face, mean, std))
+            seen += 1
+            if seen >= NUM_CALIBRATION_FACES:
+                break
+
+    if seen == 0:
+        print("[quantize] ERROR: No faces found for calibration.")
+        return
+
+    quantized = convert_fx(prepared)
+    scripted = torch.jit.trace(quantized, example)
+    torch.jit.save(scripted, QUANTIZED_MODEL_PATH,
+                   _extra_files={"input_order": QUANTIZED_INPUT_ORDER})
+    print(f"[quantize] Calibrated on {seen} faces, saved {QUANTIZED_MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()